@@ -6,6 +6,7 @@ setup(
     packages=find_packages("src"),
     package_dir={"": "src"},
     install_requires=["requests", "subresource-integrity"],
+    extras_require={"build": ["rjsmin", "fonttools", "brotli"]},
     package_data={
         # If any package contains *.txt or *.rst files, include them:
         "": ["*.txt", "*.rst", "*.msg"],
@@ -0,0 +1,438 @@
+import hashlib
+import io
+import json
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.template import engines
+from requests import RequestException, get
+import subresource_integrity as integrity
+
+try:
+    from rjsmin import jsmin
+except ImportError:
+    jsmin = None
+
+try:
+    from fontTools import subset as font_subset
+    from fontTools.ttLib import TTFont
+except ImportError:
+    font_subset = None
+
+BUILD_SUBDIR = "include_bootstrap"
+# Dot files are skipped by collectstatic, so the manifest and the scan cache are not published
+MANIFEST_NAME = ".manifest.json"
+SCAN_CACHE_NAME = ".scan_cache.json"
+JAVASCRIPT_SOURCE = "https://cdn.jsdelivr.net/npm/bootstrap@{version}/js/dist/"
+
+# Bootstrap 4 plugins in the order they appear in the official bundle, util must always go first
+COMPONENTS = (
+    "util",
+    "alert",
+    "button",
+    "carousel",
+    "collapse",
+    "dropdown",
+    "modal",
+    "tooltip",
+    "popover",
+    "scrollspy",
+    "tab",
+    "toast",
+)
+
+COMPONENT_DEPENDENCIES = {
+    "popover": ("tooltip",),
+}
+
+# Plugins which need Popper.js loaded before them
+POPPER_COMPONENTS = ("dropdown", "tooltip", "popover")
+
+# Classes added by Bootstrap plugins at runtime, they never appear in templates
+JAVASCRIPT_CLASSES = (
+    "active",
+    "arrow",
+    "bs-popover-.*",
+    "bs-tooltip-.*",
+    "carousel-item-(next|prev|left|right)",
+    "collapsing",
+    "disabled",
+    "drop(up|right|left)",
+    "fade",
+    "focus",
+    "hide",
+    "modal-backdrop",
+    "modal-open",
+    "modal-scrollbar-measure",
+    "modal-static",
+    "pointer-event",
+    "popover",
+    "popover-body",
+    "popover-header",
+    "show",
+    "showing",
+    "tooltip",
+    "tooltip-inner",
+    "was-validated",
+)
+
+_manifest_cache = {}
+
+_WORD_RE = re.compile(r"[A-Za-z0-9_-]+")
+_COMMENT_RE = re.compile(r"(/\*.*?\*/)|(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')", re.S)
+_CSS_TOKEN_RE = re.compile(r"\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'|[{};]")
+_CLASS_RE = re.compile(r"\.(-?[_a-zA-Z][\w-]*)")
+_NOT_RE = re.compile(r":not\([^)]*\)")
+_NESTED_AT_RULES = ("media", "supports", "document", "-moz-document")
+_SOURCE_MAP_RE = re.compile(rb"^//# sourceMappingURL=.*$", re.M)
+_FONT_FACE_RE = re.compile(r"@font-face\s*\{[^}]*\}")
+_CONTENT_RE = re.compile(r"content\s*:\s*[\"']\\([0-9a-fA-F]{1,6})[\"']")
+
+
+class BuildError(Exception):
+    pass
+
+
+def split_components(components) -> list:
+    """Accept a list of component names or comma separated strings."""
+    if not components:
+        return []
+    if isinstance(components, str):
+        components = [components]
+    names = (name.strip().lower() for value in components for name in value.split(","))
+    return [name for name in names if name]
+
+
+def resolve_components(components) -> tuple:
+    """Return components with util and dependencies added, in bundle order."""
+    required = {"util"}
+    for component in split_components(components):
+        if component not in COMPONENTS:
+            raise BuildError(f'Unknown Bootstrap component "{component}"')
+        required.add(component)
+        required.update(COMPONENT_DEPENDENCIES.get(component, ()))
+    return tuple(component for component in COMPONENTS if component in required)
+
+
+def components_key(components) -> str:
+    return "javascript:" + ",".join(resolve_components(components))
+
+
+def get_build_dir(build_dir=None) -> str:
+    """Return directory to write built assets to, it should be listed in STATICFILES_DIRS."""
+    if not build_dir:
+        raise BuildError('Set "build_dir" in INCLUDE_BOOTSTRAP_SETTINGS to a directory listed in STATICFILES_DIRS')
+    static_root = getattr(settings, "STATIC_ROOT", None)
+    if static_root and os.path.abspath(build_dir) == os.path.abspath(static_root):
+        raise BuildError('"build_dir" can not be STATIC_ROOT, use a directory listed in STATICFILES_DIRS')
+    return str(build_dir)
+
+
+def is_static_dir(build_dir: str) -> bool:
+    """Return whether build_dir is listed in STATICFILES_DIRS without a prefix."""
+    static_dirs = [os.path.abspath(directory) for directory in getattr(settings, "STATICFILES_DIRS", ())
+                   if not isinstance(directory, (list, tuple))]
+    return os.path.abspath(build_dir) in static_dirs
+
+
+def manifest_specs(build_dir: str) -> tuple:
+    """
+    Return built assets manifest and a dict for objects derived from it.
+
+    Both are cached until the manifest mtime changes.
+    """
+    path = os.path.join(build_dir, BUILD_SUBDIR, MANIFEST_NAME)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return {}, {}
+    cached = _manifest_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1], cached[2]
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    _manifest_cache[path] = (mtime, manifest, {})
+    return manifest, _manifest_cache[path][2]
+
+
+def read_manifest(build_dir: str) -> dict:
+    """Read built assets manifest, the parsed file is cached until its mtime changes."""
+    return manifest_specs(build_dir)[0]
+
+
+def update_manifest(build_dir: str, name: str, entry: dict) -> None:
+    manifest = dict(read_manifest(build_dir))
+    manifest[name] = entry
+    path = os.path.join(build_dir, BUILD_SUBDIR, MANIFEST_NAME)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    _manifest_cache.pop(path, None)
+
+
+def read_source(location: str) -> bytes:
+    """Read a file from an url or a local path."""
+    if location.startswith(("http://", "https://")):
+        try:
+            response = get(location)
+        except RequestException as e:
+            raise BuildError(f"Can not read {location}: {e}")
+        if not response or response.status_code != 200:
+            raise BuildError(f"{location} does not exists!")
+        return response.content
+    try:
+        with open(location, "rb") as f:
+            return f.read()
+    except OSError as e:
+        raise BuildError(f"Can not read {location}: {e}")
+
+
+def join_location(base: str, name: str) -> str:
+    if base.startswith(("http://", "https://")):
+        return base.rstrip("/") + "/" + name
+    return os.path.join(base, name)
+
+
+def minify_js(content: bytes) -> bytes:
+    """Minify JavaScript with rjsmin if it is installed, otherwise return content as is."""
+    if jsmin is None:
+        return content
+    return jsmin(content.decode("utf-8"), keep_bang_comments=True).encode("utf-8")
+
+
+def write_asset(build_dir: str, name: str, extension: str, content: bytes) -> dict:
+    """Write content to a content-hashed file and return its manifest entry."""
+    digest = hashlib.md5(content).hexdigest()[:12]
+    path = f"{BUILD_SUBDIR}/{name}.{digest}.{extension}"
+    os.makedirs(os.path.join(build_dir, BUILD_SUBDIR), exist_ok=True)
+    with open(os.path.join(build_dir, path), "wb") as f:
+        f.write(content)
+    return {"path": path, "integrity": integrity.render(content), "size": len(content)}
+
+
+def served_integrity(entry: dict) -> str:
+    """
+    Return SRI of a built file as it is served.
+
+    Hashed staticfiles storages rewrite url() references of collected CSS, so without DEBUG the integrity
+    is computed from the stored file.
+    """
+    stored_name = getattr(staticfiles_storage, "stored_name", None)
+    if stored_name is None or settings.DEBUG:
+        return entry["integrity"]
+    with staticfiles_storage.open(stored_name(entry["path"])) as f:
+        return integrity.render(f.read())
+
+
+def build_javascript(build_dir: str, components, source: str) -> tuple:
+    """Concatenate and minify Bootstrap plugins from source directory or url, return manifest key and entry."""
+    resolved = resolve_components(components)
+    content = b"\n".join(read_source(join_location(source, f"{component}.js")) for component in resolved)
+    # Source maps are not built, hashed staticfiles storages would fail on missing files
+    content = _SOURCE_MAP_RE.sub(b"", content)
+    key = components_key(resolved)
+    entry = write_asset(build_dir, "bootstrap", "js", minify_js(content))
+    entry["components"] = list(resolved)
+    update_manifest(build_dir, key, entry)
+    return key, entry
+
+
+def template_dirs() -> list:
+    """Return directories of all configured template engines, including app templates."""
+    dirs = []
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            if str(directory) not in dirs:
+                dirs.append(str(directory))
+    return dirs
+
+
+def scan_words(build_dir: str, paths, extensions) -> set:
+    """
+    Collect class name like words from files in paths.
+
+    Words of each file are cached with its mtime, so only changed files are read again.
+    """
+    cache_path = os.path.join(build_dir, BUILD_SUBDIR, SCAN_CACHE_NAME)
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    extensions = {f".{extension.lstrip('.')}" for extension in extensions}
+    scanned = {}
+    words = set()
+    for path in paths:
+        for root, _, files in os.walk(path):
+            for name in files:
+                if os.path.splitext(name)[1] not in extensions:
+                    continue
+                file_path = os.path.join(root, name)
+                mtime = os.stat(file_path).st_mtime
+                cached = cache.get(file_path)
+                if cached and cached[0] == mtime:
+                    file_words = cached[1]
+                else:
+                    with open(file_path, encoding="utf-8", errors="ignore") as f:
+                        file_words = sorted(set(_WORD_RE.findall(f.read())))
+                scanned[file_path] = [mtime, file_words]
+                words.update(file_words)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(scanned, f)
+    return words
+
+
+def _split_css(css: str) -> list:
+    """Split css to top level (prelude, body) pairs, body is None for statements like @charset."""
+    blocks = []
+    start = prelude_end = depth = 0
+    for match in _CSS_TOKEN_RE.finditer(css):
+        token = match.group()
+        if token == "{":
+            if depth == 0:
+                prelude_end = match.start()
+            depth += 1
+        elif token == "}":
+            depth -= 1
+            if depth == 0:
+                blocks.append((css[start:prelude_end].strip(), css[prelude_end + 1:match.start()]))
+                start = match.end()
+        elif token == ";" and depth == 0:
+            blocks.append((css[start:match.start()].strip(), None))
+            start = match.end()
+    return blocks
+
+
+def _split_selectors(prelude: str) -> list:
+    selectors = []
+    start = depth = 0
+    for i, char in enumerate(prelude):
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == "," and depth == 0:
+            selectors.append(prelude[start:i].strip())
+            start = i + 1
+    selectors.append(prelude[start:].strip())
+    return selectors
+
+
+def _purge_blocks(css: str, keep) -> str:
+    rules = []
+    for prelude, body in _split_css(css):
+        if body is None:
+            rules.append(f"{prelude};")
+        elif prelude.startswith("@"):
+            name = re.match(r"@([\w-]*)", prelude).group(1).lower()
+            if name in _NESTED_AT_RULES:
+                body = _purge_blocks(body, keep)
+                if body:
+                    rules.append(f"{prelude}{{{body}}}")
+            else:
+                rules.append(f"{prelude}{{{body}}}")
+        else:
+            selectors = [selector for selector in _split_selectors(prelude)
+                         if all(keep(name) for name in _CLASS_RE.findall(_NOT_RE.sub("", selector)))]
+            if selectors:
+                rules.append(f"{','.join(selectors)}{{{body.strip()}}}")
+    return "".join(rules)
+
+
+def safelist_patterns(safelist) -> tuple:
+    """Return safelist setting as a tuple of patterns, a single string is one pattern."""
+    if not safelist:
+        return ()
+    if isinstance(safelist, str):
+        safelist = (safelist,)
+    elif not isinstance(safelist, (list, tuple, set, frozenset)):
+        raise BuildError("Safelist should be a list of regular expressions")
+    for pattern in safelist:
+        try:
+            re.compile(pattern)
+        except (re.error, TypeError) as e:
+            raise BuildError(f'Invalid safelist pattern "{pattern}": {e}')
+    return tuple(safelist)
+
+
+def purge_css(css: str, words, safelist=()) -> str:
+    """
+    Remove selectors with classes that are not in words or safelist.
+
+    Safelist items are regular expressions matched against the whole class name.
+    Comments are removed except license comments like /*! ... */.
+    """
+    words = set(words)
+    safelist_re = re.compile("|".join(f"(?:{pattern})" for pattern in safelist_patterns(safelist)) or "(?!)")
+
+    def keep(name):
+        return name in words or safelist_re.fullmatch(name) is not None
+
+    licenses = []
+
+    def strip_comment(match):
+        if match.group(1) and match.group(1).startswith("/*!"):
+            licenses.append(match.group(1))
+        return match.group(2) or ""
+
+    css = _COMMENT_RE.sub(strip_comment, css)
+    return "\n".join(licenses + [_purge_blocks(css, keep)])
+
+
+def build_css(build_dir: str, source: str, paths, extensions, safelist=()) -> dict:
+    """Purge Bootstrap CSS from source with words used in paths, return manifest entry."""
+    css = read_source(source).decode("utf-8")
+    words = scan_words(build_dir, paths, extensions)
+    content = purge_css(css, words, JAVASCRIPT_CLASSES + safelist_patterns(safelist)).encode("utf-8")
+    entry = write_asset(build_dir, "bootstrap", "css", content)
+    update_manifest(build_dir, "css_url", entry)
+    return entry
+
+
+def subset_font(font: bytes, codepoints) -> bytes:
+    """Return woff2 font with the given codepoints only, needs fonttools and brotli packages."""
+    if font_subset is None:
+        raise BuildError("Install fonttools and brotli packages to subset fonts")
+    content = io.BytesIO()
+    try:
+        font = TTFont(io.BytesIO(font))
+        subsetter = font_subset.Subsetter(font_subset.Options())
+        subsetter.populate(unicodes=codepoints)
+        subsetter.subset(font)
+        font.flavor = "woff2"
+        font.save(content)
+    except ImportError:
+        raise BuildError("Install brotli package to write woff2 fonts")
+    except Exception as e:
+        # fontTools raises a variety of errors for files which are not fonts or are corrupted
+        raise BuildError(f"Can not subset font: {e}")
+    return content.getvalue()
+
+
+def css_codepoints(css: str) -> list:
+    """Return sorted codepoints of content:"\\fXXX" escapes in css."""
+    return sorted({int(code, 16) for code in _CONTENT_RE.findall(css)})
+
+
+def build_fontawesome(build_dir: str, source: str, font_source: str, paths, extensions, safelist=()) -> dict:
+    """
+    Build Font Awesome CSS and woff2 font with the icons used in paths or safelist only, return manifest entry.
+
+    Glyphs are taken from "content" of the icon rules left after purging the CSS.
+    """
+    css = read_source(source).decode("utf-8")
+    words = scan_words(build_dir, paths, extensions)
+    css = _FONT_FACE_RE.sub("", purge_css(css, words, safelist))
+    codepoints = css_codepoints(css)
+    if not codepoints:
+        raise BuildError("No Font Awesome icons are used")
+    font = write_asset(build_dir, "fontawesome-webfont", "woff2", subset_font(read_source(font_source), codepoints))
+    font_face = "@font-face{font-family:'FontAwesome';src:url('%s') format('woff2');" \
+                "font-weight:normal;font-style:normal}" % font["path"].rsplit("/", 1)[-1]
+    entry = write_asset(build_dir, "font-awesome", "css", (font_face + css).encode("utf-8"))
+    entry["font"] = font["path"]
+    entry["icons"] = len(codepoints)
+    update_manifest(build_dir, "fontawesome_url", entry)
+    return entry
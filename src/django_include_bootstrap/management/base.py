@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ..build import BuildError, get_build_dir, is_static_dir, template_dirs
+from ..utils import get_bootstrap_setting
+
+USE_BUILD_WARNING = 'Set "use_build": True in INCLUDE_BOOTSTRAP_SETTINGS to use built files'
+STATIC_DIR_WARNING = '"build_dir" is not listed in STATICFILES_DIRS, built files will not be served'
+
+
+class BuildCommand(BaseCommand):
+    """Base for commands which write files to "build_dir" setting, subclasses implement build()."""
+
+    def handle(self, *args, **options):
+        try:
+            build_dir = get_build_dir(get_bootstrap_setting('build_dir'))
+            message = self.build(build_dir, **options)
+        except BuildError as e:
+            raise CommandError(e)
+        if not is_static_dir(build_dir):
+            self.stdout.write(self.style.WARNING(STATIC_DIR_WARNING))
+        if not get_bootstrap_setting('use_build'):
+            self.stdout.write(self.style.WARNING(USE_BUILD_WARNING))
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def build(self, build_dir, **options):
+        """Build files to build_dir and return a message about them."""
+        raise NotImplementedError
+
+
+class ScanCommand(BuildCommand):
+    """Base for commands which scan templates and extra paths for used classes."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--extensions', default='html,txt',
+                            help='Comma separated file extensions to scan, e.g. "html,js,py" (default=html,txt)')
+        parser.add_argument('--path', action='append', default=[], dest='paths',
+                            help='Extra directory to scan, may be used multiple times')
+
+    @staticmethod
+    def scan_options(options) -> tuple:
+        """Return paths and extensions to scan."""
+        extensions = [extension.strip() for extension in options['extensions'].split(',') if extension.strip()]
+        return template_dirs() + options['paths'], extensions
@@ -0,0 +1,26 @@
+from django.core.management.base import CommandError
+
+from ...build import JAVASCRIPT_SOURCE, build_javascript, jsmin, split_components
+from ...utils import get_bootstrap_setting
+from ..base import BuildCommand
+
+
+class Command(BuildCommand):
+    help = 'Build Bootstrap JavaScript with the selected plugins only, e.g. "build_bootstrap_js modal dropdown". ' \
+           'Plugins default to "javascript_components" setting, util plugin is always included.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('components', nargs='*', help='Bootstrap plugins to include')
+        parser.add_argument('--source', help='Directory or url with Bootstrap js/dist files, '
+                                             'defaults to "javascript_source" setting or jsDelivr CDN')
+
+    def build(self, build_dir, **options):
+        components = split_components(options['components'] or get_bootstrap_setting('javascript_components'))
+        if not components:
+            raise CommandError('No components given, pass them as arguments or set "javascript_components"')
+        source = options['source'] or get_bootstrap_setting('javascript_source') or \
+            JAVASCRIPT_SOURCE.format(version=get_bootstrap_setting('bootstrap_version'))
+        _, entry = build_javascript(build_dir, components, source)
+        if jsmin is None:
+            self.stdout.write(self.style.WARNING('rjsmin is not installed, the file was not minified'))
+        return f'Built {", ".join(entry["components"])} to {entry["path"]}'
@@ -0,0 +1,35 @@
+import os
+from urllib.parse import urljoin
+
+from ...build import build_fontawesome
+from ...utils import get_bootstrap_setting
+from ..base import ScanCommand
+
+FONT_PATH = "../fonts/fontawesome-webfont.ttf"
+
+
+class Command(ScanCommand):
+    help = 'Build Font Awesome CSS and woff2 webfont with only the "fa-*" icons used in templates. ' \
+           'Icons named dynamically should be added to "fontawesome_safelist" setting. ' \
+           'Needs fonttools and brotli packages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', help='Path or url of Font Awesome CSS, '
+                                             'defaults to "fontawesome_source" setting or "fontawesome_url"')
+        parser.add_argument('--font', help='Path or url of Font Awesome ttf font, defaults to '
+                                           '"fontawesome_font_source" setting or fonts/fontawesome-webfont.ttf '
+                                           'next to the CSS directory')
+        super().add_arguments(parser)
+
+    def build(self, build_dir, **options):
+        source = options['source'] or get_bootstrap_setting('fontawesome_source') or \
+            get_bootstrap_setting('fontawesome_url').url
+        font_source = options['font'] or get_bootstrap_setting('fontawesome_font_source')
+        if not font_source and source.startswith(('http://', 'https://')):
+            font_source = urljoin(source, FONT_PATH)
+        elif not font_source:
+            font_source = os.path.normpath(os.path.join(os.path.dirname(source), FONT_PATH))
+        paths, extensions = self.scan_options(options)
+        entry = build_fontawesome(build_dir, source, font_source, paths, extensions,
+                                  get_bootstrap_setting('fontawesome_safelist'))
+        return f'Built {entry["path"]} and {entry["font"]} with {entry["icons"]} icons'
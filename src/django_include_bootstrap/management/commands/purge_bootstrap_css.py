@@ -0,0 +1,19 @@
+from ...build import build_css
+from ...utils import get_bootstrap_setting
+from ..base import ScanCommand
+
+
+class Command(ScanCommand):
+    help = 'Build Bootstrap CSS with only the selectors whose classes are used in templates. ' \
+           'Classes built dynamically should be added to "css_safelist" setting.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', help='Path or url of Bootstrap CSS, '
+                                             'defaults to "css_source" setting or "css_url"')
+        super().add_arguments(parser)
+
+    def build(self, build_dir, **options):
+        source = options['source'] or get_bootstrap_setting('css_source') or get_bootstrap_setting('css_url').url
+        paths, extensions = self.scan_options(options)
+        entry = build_css(build_dir, source, paths, extensions, get_bootstrap_setting('css_safelist'))
+        return f'Built {entry["path"]}, {entry["size"]} bytes'
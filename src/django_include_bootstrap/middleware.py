@@ -0,0 +1,70 @@
+from .templatetags.include_bootstrap import bootstrap_css, bootstrap_javascript, fontawesome_css
+from .utils import get_bootstrap_setting, required_assets
+
+# Closing tags are looked for in this many bytes from the start (</head>) and the end (</body>) of the page
+SEARCH_LIMIT = 64 * 1024
+
+
+class IncludeBootstrapMiddleware:
+    """
+    Inject tags of the asset groups recorded with {% bootstrap_require %} during the render.
+
+    CSS goes before </head>, JavaScript before </body> (or </head> with "javascript_in_head" setting).
+    Closing tags are matched case-insensitively, </head> only in the first SEARCH_LIMIT bytes and </body>
+    only in the last SEARCH_LIMIT bytes of the page, tags are not injected if they are not found there.
+    Pages which require nothing, streaming and already encoded responses are returned untouched,
+    so list this middleware after GZipMiddleware in MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = required_assets.set(set())
+        try:
+            response = self.get_response(request)
+            groups = required_assets.get()
+        finally:
+            required_assets.reset(token)
+        if groups and self.can_inject(response):
+            self.inject(response, groups)
+        return response
+
+    @staticmethod
+    def can_inject(response):
+        return not response.streaming and not response.has_header("Content-Encoding") and \
+            "html" in response.get("Content-Type", "")
+
+    @staticmethod
+    def render_tags(groups):
+        head_tags, body_tags = [], []
+        if "css" in groups:
+            head_tags.append(bootstrap_css())
+        if "icons" in groups:
+            head_tags.append(fontawesome_css())
+        if "javascript" in groups or "popover" in groups:
+            javascript = bootstrap_javascript(popover="popover" in groups)
+            (head_tags if get_bootstrap_setting("javascript_in_head") else body_tags).append(javascript)
+        return "\n".join(head_tags), "\n".join(body_tags)
+
+    def inject(self, response, groups):
+        head_html, body_html = self.render_tags(groups)
+        content = response.content
+        head = content[:SEARCH_LIMIT].lower().find(b"</head>") if head_html else -1
+        body = -1
+        if body_html:
+            tail_start = max(len(content) - SEARCH_LIMIT, 0)
+            body = content[tail_start:].lower().rfind(b"</body>")
+            if body != -1:
+                body += tail_start
+        if head == -1 and body == -1:
+            return
+        parts = []
+        start = 0
+        for position, html in sorted(pair for pair in ((head, head_html), (body, body_html)) if pair[0] != -1):
+            parts += [content[start:position], html.encode(response.charset), b"\n"]
+            start = position
+        parts.append(content[start:])
+        response.content = b"".join(parts)
+        if response.has_header("Content-Length"):
+            response["Content-Length"] = str(len(response.content))
@@ -2,18 +2,21 @@ from django import template
 
 from django.utils.safestring import mark_safe
 
+from ..build import POPPER_COMPONENTS, BuildError, split_components
 from ..utils import (
+    AssetSpec,
     css_url,
     get_bootstrap_setting,
     javascript_url,
     javascript_bundle_url,
+    javascript_components_url,
     jquery_slim_url,
     jquery_url,
     popper_url,
     fontawesome_css_url,
     render_link_tag,
     render_script_tag,
-    render_tag,
+    require_assets,
 )
 
 register = template.Library()
@@ -27,7 +30,8 @@ def bootstrap_setting(value):
     A simple way to read bootstrap settings in a template.
     Please consider this filter private for now, do not use it in your own templates.
     """
-    return get_bootstrap_setting(value)
+    setting = get_bootstrap_setting(value)
+    return setting.as_dict() if isinstance(setting, AssetSpec) else setting
 
 
 @register.simple_tag
@@ -200,8 +204,9 @@ def bootstrap_css():
         {% bootstrap_css %}
     """
     rendered_urls = []
-    if bootstrap_css_url():
-        rendered_urls.append(render_link_tag(bootstrap_css_url()))
+    url = bootstrap_css_url()
+    if url:
+        rendered_urls.append(render_link_tag(url))
     return mark_safe("".join([url for url in rendered_urls]))
 
 
@@ -251,8 +256,9 @@ def fontawesome_css():
             {% fontawesome_css %}
         """
     rendered_urls = []
-    if fontawesome_url():
-        rendered_urls.append(render_link_tag(fontawesome_url()))
+    url = fontawesome_url()
+    if url:
+        rendered_urls.append(render_link_tag(url))
     return mark_safe("".join([url for url in rendered_urls]))
 
 
@@ -290,17 +296,11 @@ def bootstrap_jquery(jquery=True):
     else:
         jquery = get_bootstrap_setting("jquery_url")
 
-    if isinstance(jquery, str):
-        jquery = dict(src=jquery)
-    else:
-        jquery = jquery.copy()
-        jquery.setdefault("src", jquery.pop("url", None))
-
-    return render_tag("script", attrs=jquery)
+    return render_script_tag(jquery)
 
 
 @register.simple_tag
-def bootstrap_javascript(jquery=False, popover=False, bundle=False):
+def bootstrap_javascript(jquery=False, popover=False, bundle=False, components=None):
     """
     Return HTML for Bootstrap JavaScript.
 
@@ -321,6 +321,12 @@ def bootstrap_javascript(jquery=False, popover=False, bundle=False):
         :jquery: False|"slim"|True (default=False)
         :popover: False|True (default=False)
         :bundle: False|True (default=False)
+        :components: comma separated Bootstrap plugins, e.g. "modal,dropdown" (default=None)
+
+    When components are given (or set with "javascript_components" setting) and were built with
+    ``manage.py build_bootstrap_js``, the built file is used instead of the full library.
+    Popper.js is included if one of the components needs it. If no such build exists the full library is used,
+    unknown components raise TemplateSyntaxError.
 
     **Usage**::
 
@@ -329,6 +335,7 @@ def bootstrap_javascript(jquery=False, popover=False, bundle=False):
     **Example**::
 
         {% bootstrap_javascript jquery="slim" popover="True" bundle="True" %}
+        {% bootstrap_javascript components="modal,dropdown,collapse" %}
     """
     # List of JS tags to include
     javascript_tags = []
@@ -340,13 +347,26 @@ def bootstrap_javascript(jquery=False, popover=False, bundle=False):
     if jquery:
         javascript_tags.append(bootstrap_jquery(jquery=jquery))
 
+    # Bootstrap 4 JavaScript built with the selected plugins only
+    components = split_components(components or get_bootstrap_setting("javascript_components"))
+    try:
+        components_url = javascript_components_url(components) if components else None
+    except BuildError as e:
+        raise template.TemplateSyntaxError(e)
+    if components_url:
+        popover = popover or any(component in POPPER_COMPONENTS for component in components)
+        bundle = False
+
     # Popper.js library
     if popover and not bundle:
         javascript_tags.append(render_script_tag(bootstrap_popper_url()))
 
     # Bootstrap 4 JavaScript, Bundle already include popover
-    bootstrap_js_url = bootstrap_javascript_url() if not bundle else bootstrap_javascript_bundle_url()
-    if '.bundle' in bootstrap_js_url['url'] and popover and not bundle:
+    if components_url:
+        bootstrap_js_url = components_url
+    else:
+        bootstrap_js_url = bootstrap_javascript_url() if not bundle else bootstrap_javascript_bundle_url()
+    if '.bundle' in bootstrap_js_url.url and popover and not bundle:
         javascript_tags.pop()
 
     if bootstrap_js_url:
@@ -354,3 +374,33 @@ def bootstrap_javascript(jquery=False, popover=False, bundle=False):
 
     # Join and return
     return mark_safe("\n".join(javascript_tags))
+
+
+@register.simple_tag
+def bootstrap_require(*groups):
+    """
+    Record asset groups the page needs, IncludeBootstrapMiddleware injects their tags into the response.
+
+    Renders nothing. Without the middleware the tag does nothing.
+
+    **Tag name**::
+
+        bootstrap_require
+
+    **Parameters**:
+
+        :groups: "css", "icons", "javascript" and/or "popover"
+
+    **Usage**::
+
+        {% bootstrap_require "icons" %}
+
+    **Example**::
+
+        {% bootstrap_require "css" "javascript" %}
+    """
+    try:
+        require_assets(*groups)
+    except ValueError as e:
+        raise template.TemplateSyntaxError(e)
+    return ""
@@ -0,0 +1,341 @@
+import os
+import shutil
+import tempfile
+from unittest import mock, skipIf
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template import Context, Template, TemplateSyntaxError
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from requests import RequestException
+
+from .build import BUILD_SUBDIR, BuildError, build_fontawesome, build_javascript, components_key, css_codepoints, \
+    font_subset, get_build_dir, is_static_dir, purge_css, read_manifest, read_source, resolve_components, \
+    safelist_patterns, scan_words, subset_font, update_manifest, write_asset
+from .middleware import IncludeBootstrapMiddleware
+from .templatetags.include_bootstrap import bootstrap_css, bootstrap_javascript
+from .utils import AssetSpec, css_url, generate_urls_settings, get_bootstrap_setting, require_assets
+
+FONTAWESOME_CSS = "/*! Font Awesome 4.7.0 */@font-face{font-family:'FontAwesome';src:url('../fonts/x.eot')}" \
+                  ".fa{display:inline-block}.fa-lg{font-size:1.33em}.fa-glass:before{content:\"\\f000\"}" \
+                  ".fa-music:before{content:\"\\f001\"}.fa-remove:before,.fa-close:before{content:\"\\f00d\"}"
+
+
+class PurgeCssTest(SimpleTestCase):
+
+    def test_grouped_selectors(self):
+        css = "h1,.h1,.btn-primary,.btn-secondary{margin:0}.unused,.also-unused{color:red}"
+        self.assertEqual(purge_css(css, {"btn-primary"}), "h1,.btn-primary{margin:0}")
+
+    def test_nested_at_rules(self):
+        css = "@media (min-width:576px){.col-sm{flex:1}.container{max-width:540px}}" \
+              "@supports (position:sticky){.sticky-top{position:sticky}}" \
+              "@media print{@supports (display:grid){.container{display:grid}.row{a:b}}.unused{a:b}}"
+        self.assertEqual(purge_css(css, {"container"}),
+                         "@media (min-width:576px){.container{max-width:540px}}"
+                         "@media print{@supports (display:grid){.container{display:grid}}}")
+
+    def test_not_selector(self):
+        css = ".btn:not(.disabled):active{a:b}.btn:not(.disabled) .caret{c:d}"
+        self.assertEqual(purge_css(css, {"btn"}), ".btn:not(.disabled):active{a:b}")
+
+    def test_keyframes_and_font_face_kept(self):
+        css = "@keyframes spin{from{a:b}to{c:d}}@font-face{font-family:x}.spinner{animation:spin}"
+        self.assertEqual(purge_css(css, set()), "@keyframes spin{from{a:b}to{c:d}}@font-face{font-family:x}")
+
+    def test_comments(self):
+        css = "/*! Bootstrap | MIT */.a{b:c}/* .unused{} */.d{content:\"/* { */\"}"
+        self.assertEqual(purge_css(css, {"a", "d"}), "/*! Bootstrap | MIT */\n.a{b:c}.d{content:\"/* { */\"}")
+
+    def test_safelist(self):
+        css = ".navbar-1{a:b}.navbar-dark{c:d}.nav{e:f}"
+        self.assertEqual(purge_css(css, set(), [r"navbar-\d+"]), ".navbar-1{a:b}")
+        self.assertEqual(purge_css(css, set(), r"navbar-\d+|nav"), ".navbar-1{a:b}.nav{e:f}")
+
+    def test_safelist_patterns(self):
+        self.assertEqual(safelist_patterns("btn-.*"), ("btn-.*",))
+        self.assertEqual(safelist_patterns(["a", "b"]), ("a", "b"))
+        self.assertEqual(safelist_patterns(None), ())
+        with self.assertRaises(BuildError):
+            safelist_patterns(1)
+        with self.assertRaisesMessage(BuildError, 'Invalid safelist pattern "btn-("'):
+            safelist_patterns(["a", "btn-("])
+        with self.assertRaises(BuildError):
+            purge_css(".a{b:c}", {"a"}, "[")
+
+
+class ScanWordsTest(SimpleTestCase):
+
+    def setUp(self):
+        self.build_dir = tempfile.mkdtemp()
+        self.templates = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.build_dir)
+        self.addCleanup(shutil.rmtree, self.templates)
+        self.template = os.path.join(self.templates, "index.html")
+
+    def write_template(self, content, mtime):
+        with open(self.template, "w") as f:
+            f.write(content)
+        os.utime(self.template, (mtime, mtime))
+
+    def test_scan(self):
+        self.write_template('<div class="btn btn-{{ style }}">', 1000)
+        with open(os.path.join(self.templates, "script.js"), "w") as f:
+            f.write("modal-open")
+        self.assertEqual(scan_words(self.build_dir, [self.templates], ["html"]),
+                         {"div", "class", "btn", "btn-", "style"})
+        self.assertIn("modal-open", scan_words(self.build_dir, [self.templates], ["html", "js"]))
+
+    def test_cache(self):
+        self.write_template('<i class="fa-glass">', 1000)
+        self.assertIn("fa-glass", scan_words(self.build_dir, [self.templates], ["html"]))
+        # Unchanged mtime, words are taken from the cache
+        self.write_template('<i class="fa-music">', 1000)
+        self.assertIn("fa-glass", scan_words(self.build_dir, [self.templates], ["html"]))
+        self.write_template('<i class="fa-music">', 2000)
+        words = scan_words(self.build_dir, [self.templates], ["html"])
+        self.assertIn("fa-music", words)
+        self.assertNotIn("fa-glass", words)
+
+
+class FontawesomeTest(SimpleTestCase):
+
+    def setUp(self):
+        self.build_dir = tempfile.mkdtemp()
+        self.templates = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.build_dir)
+        self.addCleanup(shutil.rmtree, self.templates)
+        self.source = os.path.join(self.build_dir, "font-awesome.css")
+        with open(self.source, "w") as f:
+            f.write(FONTAWESOME_CSS)
+        with open(os.path.join(self.templates, "index.html"), "w") as f:
+            f.write('<i class="fa fa-close"></i><i class="fa fa-{{ icon }}"></i>')
+
+    def test_codepoints(self):
+        css = purge_css(FONTAWESOME_CSS, {"fa", "fa-close", "fa-glass"})
+        self.assertEqual(css_codepoints(css), [0xf000, 0xf00d])
+
+    @mock.patch("django_include_bootstrap.build.subset_font", return_value=b"font")
+    def test_build(self, subset_font):
+        entry = build_fontawesome(self.build_dir, self.source, self.source, [self.templates], ["html"],
+                                  safelist=["fa-music"])
+        self.assertEqual(subset_font.call_args[0][1], [0xf001, 0xf00d])
+        self.assertEqual(entry["icons"], 2)
+        self.assertEqual(read_manifest(self.build_dir)["fontawesome_url"]["path"], entry["path"])
+        with open(os.path.join(self.build_dir, entry["path"])) as f:
+            css = f.read()
+        self.assertIn(".fa-close:before", css)
+        self.assertIn(".fa-music:before", css)
+        self.assertNotIn("fa-glass", css)
+        self.assertNotIn("x.eot", css)
+
+    @skipIf(font_subset is None, "fonttools is not installed")
+    def test_invalid_font(self):
+        with self.assertRaisesMessage(BuildError, "Can not subset font"):
+            subset_font(b"not a font", [0xf000])
+
+    @mock.patch("django_include_bootstrap.build.get", side_effect=RequestException("offline"))
+    def test_source_unreachable(self, get):
+        with self.assertRaisesMessage(BuildError, "Can not read https://example.com/x.css: offline"):
+            read_source("https://example.com/x.css")
+
+
+@override_settings(INCLUDE_BOOTSTRAP_SETTINGS={})
+class MiddlewareTest(SimpleTestCase):
+    page = "<html><head><title>Page</title></head><body>Content</body></html>"
+
+    def get_response(self, *groups, response=None):
+        def view(request):
+            require_assets(*groups)
+            return response or HttpResponse(self.page)
+        return IncludeBootstrapMiddleware(view)(RequestFactory().get("/"))
+
+    def test_css_before_head(self):
+        content = self.get_response("css", "icons").content.decode()
+        head, body = content.split("</head>")
+        self.assertIn("bootstrap.min.css", head)
+        self.assertIn("font-awesome.min.css", head)
+        self.assertNotIn("<script", content)
+        self.assertTrue(head.startswith("<html><head><title>Page</title><link"))
+
+    def test_javascript_before_body(self):
+        content = self.get_response("javascript").content.decode()
+        head, body = content.split("</head>")
+        self.assertNotIn("<script", head)
+        self.assertIn("bootstrap.min.js", body.split("</body>")[0])
+        self.assertNotIn("popper", content)
+        self.assertIn("popper.min.js", self.get_response("popover").content.decode())
+
+    @override_settings(INCLUDE_BOOTSTRAP_SETTINGS={"javascript_in_head": True})
+    def test_javascript_in_head(self):
+        head, body = self.get_response("javascript").content.decode().split("</head>")
+        self.assertIn("bootstrap.min.js", head)
+        self.assertNotIn("<script", body)
+
+    def test_uppercase_tags(self):
+        self.page = self.page.upper()
+        content = self.get_response("css", "javascript").content.decode()
+        head, body = content.split("</HEAD>")
+        self.assertIn("bootstrap.min.css", head)
+        self.assertIn("bootstrap.min.js", body.split("</BODY>")[0])
+
+    def test_nothing_required(self):
+        self.assertEqual(self.get_response().content.decode(), self.page)
+
+    def test_skipped_responses(self):
+        streaming = StreamingHttpResponse([self.page])
+        self.assertIs(self.get_response("css", response=streaming), streaming)
+        self.assertEqual(b"".join(streaming.streaming_content).decode(), self.page)
+        gzipped = HttpResponse(self.page)
+        gzipped["Content-Encoding"] = "gzip"
+        self.assertEqual(self.get_response("css", response=gzipped).content.decode(), self.page)
+        json = HttpResponse(self.page, content_type="application/json")
+        self.assertEqual(self.get_response("css", response=json).content.decode(), self.page)
+
+    def test_content_length(self):
+        response = HttpResponse(self.page)
+        response["Content-Length"] = str(len(self.page))
+        response = self.get_response("css", "javascript", response=response)
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+        self.assertGreater(len(response.content), len(self.page))
+
+
+class BuiltUrlTest(SimpleTestCase):
+
+    def setUp(self):
+        self.build_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.build_dir)
+        settings_override = override_settings(STATIC_URL="/static/",
+                                              INCLUDE_BOOTSTRAP_SETTINGS={"use_build": True,
+                                                                          "build_dir": self.build_dir})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def build(self, content):
+        entry = write_asset(self.build_dir, "bootstrap", "css", content)
+        update_manifest(self.build_dir, "css_url", entry)
+        return entry
+
+    def test_not_built(self):
+        self.assertIn("bootstrap.min.css", css_url().url)
+
+    def test_spec_cached_with_manifest(self):
+        entry = self.build(b".a{b:c}")
+        spec = css_url()
+        self.assertEqual(spec.url, f"/static/{entry['path']}")
+        self.assertEqual(spec.integrity, entry["integrity"])
+        self.assertIn('crossorigin="anonymous"', spec.html)
+        self.assertIs(css_url(), spec)
+        self.assertEqual(bootstrap_css(), spec.html)
+        self.build(b".d{e:f}")
+        self.assertIsNot(css_url(), spec)
+        with override_settings(INCLUDE_BOOTSTRAP_SETTINGS={"use_build": False, "build_dir": self.build_dir}):
+            self.assertIn("bootstrap.min.css", css_url().url)
+
+    def test_build_dir(self):
+        with self.assertRaises(BuildError):
+            get_build_dir(None)
+        with override_settings(STATIC_ROOT=self.build_dir), self.assertRaises(BuildError):
+            get_build_dir(self.build_dir)
+        self.assertFalse(is_static_dir(self.build_dir))
+        with override_settings(STATICFILES_DIRS=[self.build_dir]):
+            self.assertTrue(is_static_dir(self.build_dir))
+        with override_settings(STATICFILES_DIRS=[("prefix", self.build_dir)]):
+            self.assertFalse(is_static_dir(self.build_dir))
+
+    def test_asset_spec(self):
+        spec = AssetSpec("/a.css", "sha384-x", kind="link")
+        self.assertEqual(spec.html, '<link href="/a.css" integrity="sha384-x" rel="stylesheet">')
+        self.assertEqual(spec.as_dict(), {"href": "/a.css", "integrity": "sha384-x"})
+        with self.assertRaises(AttributeError):
+            spec.url = "/b.css"
+
+
+@override_settings(INCLUDE_BOOTSTRAP_SETTINGS={})
+class UrlTagsTest(SimpleTestCase):
+
+    def test_bare_url(self):
+        for tag, name in (("bootstrap_css_url", "css_url"), ("bootstrap_javascript_url", "javascript_url"),
+                          ("bootstrap_javascript_bundle_url", "javascript_bundle_url"),
+                          ("bootstrap_jquery_url", "jquery_url"), ("bootstrap_jquery_slim_url", "jquery_slim_url"),
+                          ("bootstrap_popper_url", "popper_url"), ("fontawesome_url", "fontawesome_url")):
+            with self.subTest(tag=tag):
+                rendered = Template("{% load include_bootstrap %}{% " + tag + " %}").render(Context())
+                self.assertEqual(rendered, get_bootstrap_setting(name).url)
+                self.assertTrue(rendered.startswith("https://"))
+
+    def test_defaults_read_only(self):
+        urls_settings = generate_urls_settings({})
+        with self.assertRaises(TypeError):
+            urls_settings["css_url"] = AssetSpec("/a.css")
+        self.assertIs(generate_urls_settings({})["css_url"], urls_settings["css_url"])
+
+
+class ComponentsTest(SimpleTestCase):
+
+    def test_resolve_components(self):
+        self.assertEqual(resolve_components("collapse"), ("util", "collapse"))
+        self.assertEqual(resolve_components(["popover", "modal"]), ("util", "modal", "tooltip", "popover"))
+        self.assertEqual(resolve_components(["toast, Util", "alert"]), ("util", "alert", "toast"))
+        self.assertEqual(components_key("modal,dropdown"), "javascript:util,dropdown,modal")
+        with self.assertRaises(BuildError):
+            resolve_components("modal,bogus")
+
+
+class BootstrapJavascriptTest(SimpleTestCase):
+
+    def setUp(self):
+        self.build_dir = tempfile.mkdtemp()
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.build_dir)
+        self.addCleanup(shutil.rmtree, self.source)
+        for component in ("util", "collapse", "dropdown", "modal"):
+            with open(os.path.join(self.source, f"{component}.js"), "w") as f:
+                f.write(f"window.{component}=1;")
+        settings_override = override_settings(STATIC_URL="/static/",
+                                              INCLUDE_BOOTSTRAP_SETTINGS={"use_build": True,
+                                                                          "build_dir": self.build_dir})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    @mock.patch("django_include_bootstrap.build.jsmin", None)
+    def test_build(self):
+        key, entry = build_javascript(self.build_dir, ["modal", "dropdown"], self.source)
+        self.assertEqual(key, "javascript:util,dropdown,modal")
+        self.assertEqual(entry["components"], ["util", "dropdown", "modal"])
+        self.assertEqual(read_manifest(self.build_dir)[key], entry)
+        with open(os.path.join(self.build_dir, entry["path"])) as f:
+            self.assertEqual(f.read(), "window.util=1;\nwindow.dropdown=1;\nwindow.modal=1;")
+
+    def test_render(self):
+        _, entry = build_javascript(self.build_dir, "dropdown,modal", self.source)
+        html = bootstrap_javascript(components="modal,dropdown")
+        self.assertIn("popper.min.js", html)
+        self.assertIn(f'src="/static/{entry["path"]}"', html)
+        self.assertIn(entry["integrity"], html)
+        self.assertNotIn("bootstrap.min.js", html)
+        self.assertLess(html.index("popper.min.js"), html.index(entry["path"]))
+        # Built file never includes Popper, so bundle is not used
+        self.assertEqual(bootstrap_javascript(components="dropdown,modal", bundle=True), html)
+        with override_settings(INCLUDE_BOOTSTRAP_SETTINGS={"use_build": True, "build_dir": self.build_dir,
+                                                           "javascript_components": ["modal", "dropdown"]}):
+            self.assertEqual(bootstrap_javascript(), html)
+
+    def test_render_without_popper(self):
+        _, entry = build_javascript(self.build_dir, "collapse", self.source)
+        html = bootstrap_javascript(components="collapse")
+        self.assertIn(entry["path"], html)
+        self.assertNotIn("popper", html)
+
+    def test_not_built(self):
+        build_javascript(self.build_dir, "collapse", self.source)
+        html = bootstrap_javascript(components="modal")
+        self.assertIn("bootstrap.min.js", html)
+        self.assertNotIn("popper", html)
+        self.assertNotIn(BUILD_SUBDIR, html)
+
+    def test_unknown_component(self):
+        with self.assertRaises(TemplateSyntaxError):
+            bootstrap_javascript(components="modal,bogus")
+        with override_settings(INCLUDE_BOOTSTRAP_SETTINGS={"javascript_components": ["bogus"]}):
+            with self.assertRaises(TemplateSyntaxError):
+                bootstrap_javascript()
@@ -2,7 +2,11 @@ from django.conf import settings
 from django.utils.safestring import mark_safe
 from django.forms.utils import flatatt
 from django.utils.html import format_html
-from copy import deepcopy
+from django.templatetags.static import static
+from contextvars import ContextVar
+from functools import lru_cache
+from types import MappingProxyType
+from .build import BuildError, components_key, get_build_dir, manifest_specs, served_integrity
 from .models import IncludeBootstrap
 
 try:
@@ -22,97 +26,173 @@ INCLUDE_BOOTSTRAP_SETTINGS = {
     "javascript_in_head": False,
     "include_jquery": False,
     "use_i18n": False,
-    "use_db": False
+    "use_db": False,
+    # Use files written by build_bootstrap_js, purge_bootstrap_css and build_fontawesome commands.
+    # They are written to "build_dir", which must be listed in STATICFILES_DIRS without a prefix,
+    # so run the commands before collectstatic. Files are linked with static() and crossorigin="anonymous".
+    "use_build": False,
+    "build_dir": None,
+    "javascript_components": None,
+    "javascript_source": None,
+    "css_source": None,
+    "css_safelist": (),
+    "fontawesome_source": None,
+    "fontawesome_safelist": (),
+    "fontawesome_font_source": None
 }
 
 
-def generate_urls_settings(setting: dict) -> dict:
+URL_SETTINGS = (
+    "css_url",
+    "javascript_url",
+    "javascript_bundle_url",
+    "jquery_url",
+    "jquery_slim_url",
+    "popper_url",
+    "fontawesome_url",
+)
+
+ASSET_GROUPS = ("css", "icons", "javascript", "popover")
+
+# Asset groups required by the current render, set by IncludeBootstrapMiddleware
+required_assets = ContextVar("required_assets", default=None)
+
+
+class AssetSpec:
+    """
+    Immutable url settings of a library file.
+
+    Escaped attributes and the whole tag are rendered once, when the spec is created.
+    """
+
+    __slots__ = ("url", "integrity", "crossorigin", "kind", "attrs", "html")
+
+    def __init__(self, url, integrity=None, crossorigin=None, kind="script"):
+        attrs = {"src" if kind == "script" else "href": url, "integrity": integrity, "crossorigin": crossorigin}
+        if kind == "link":
+            attrs["rel"] = "stylesheet"
+        object.__setattr__(self, "url", url)
+        object.__setattr__(self, "integrity", integrity)
+        object.__setattr__(self, "crossorigin", crossorigin)
+        object.__setattr__(self, "kind", kind)
+        object.__setattr__(self, "attrs", flatatt(attrs))
+        object.__setattr__(self, "html", render_tag(kind, attrs=self.attrs, close=kind == "script"))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.url!r}, kind={self.kind!r})"
+
+    def __str__(self):
+        return self.url or ""
+
+    def replace(self, **kwargs):
+        """Return a new spec with some fields replaced."""
+        fields = {"url": self.url, "integrity": self.integrity, "crossorigin": self.crossorigin, "kind": self.kind}
+        fields.update(kwargs)
+        return self.__class__(**fields)
+
+    def as_dict(self):
+        """Return url dict like it was used in settings, "href" for links and "url" for scripts."""
+        url_dict = {"href" if self.kind == "link" else "url": self.url, "integrity": self.integrity,
+                    "crossorigin": self.crossorigin}
+        return {key: value for key, value in url_dict.items() if value is not None}
+
+
+@lru_cache()
+def default_urls_settings(bootstrap_version, jquery_version, popover_version, fontawesome_version) -> MappingProxyType:
+    # Cached and shared by every call, so it is returned read-only
+    return MappingProxyType({
+        "css_url": AssetSpec(
+            f"https://stackpath.bootstrapcdn.com/bootstrap/{bootstrap_version}/css/bootstrap.min.css",
+            "sha384-Vkoo8x4CGsO3+Hhxv8T/Q5PaXtkKtu6ug5TOeNV6gBiFeWPGFN9MuhOf23Q9Ifjh",
+            "anonymous",
+            kind="link",
+        ),
+        "javascript_url": AssetSpec(
+            f"https://stackpath.bootstrapcdn.com/bootstrap/{bootstrap_version}/js/bootstrap.min.js",
+            "sha384-wfSDF2E50Y2D1uUdj0O3uMBJnjuUD4Ih7YwaYd1iqfktj0Uod8GCExl3Og8ifwB6",
+            "anonymous",
+        ),
+        "javascript_bundle_url": AssetSpec(
+            f"https://stackpath.bootstrapcdn.com/bootstrap/{bootstrap_version}/js/bootstrap.bundle.min.js",
+            "sha384-6khuMg9gaYr5AxOqhkVIODVIvm9ynTT5J4V1cfthmT+emCG6yVmEZsRHdxlotUnm",
+            "anonymous",
+        ),
+        "jquery_url": AssetSpec(
+            f"https://code.jquery.com/jquery-{jquery_version}.min.js",
+            "sha384-tsQFqpEReu7ZLhBV2VZlAu7zcOV+rXbYlF2cqB8txI/8aZajjp4Bqd+V6D5IgvKT",
+            "anonymous",
+        ),
+        "jquery_slim_url": AssetSpec(
+            f"https://code.jquery.com//jquery-{jquery_version}.slim.min.js",
+            "sha384-q8i/X+965DzO0rT7abK41JStQIAqVgRVzpbzo5smXKp4YfRvH+8abtTE1Pi6jizo",
+            "anonymous",
+        ),
+        "popper_url": AssetSpec(
+            f"https://cdnjs.cloudflare.com/ajax/libs/popper.js/{popover_version}/umd/popper.min.js",
+            "sha384-ZMP7rVo3mIykV+2+9J3UJ46jBk0WLaUAdn689aCwoqbBJiSnjAK/l8WvCWPIPm49",
+            "anonymous",
+        ),
+        "fontawesome_url": AssetSpec(
+            f"https://stackpath.bootstrapcdn.com/font-awesome/{fontawesome_version}/css/font-awesome.min.css",
+            "sha384-wvfXpqpZZVQGK6TAh5PVlGOfQNHSoD2xbE+QkPxCAFlNEevoEH3Sl0sibVcOQVnN",
+            "anonymous",
+            kind="link",
+        ),
+    })
+
+
+def generate_urls_settings(setting: dict) -> MappingProxyType:
     bootstrap_version = setting.get('bootstrap_version', VERSIONS['bootstrap_version'])
     jquery_version = setting.get('jquery_version', VERSIONS['jquery_version'])
     popover_version = setting.get('popover_version', VERSIONS['popover_version'])
     fontawesome_version = setting.get('fontawesome_version', VERSIONS['fontawesome_version'])
-    urls_settings = {
-        "css_url": {
-            "href": f"https://stackpath.bootstrapcdn.com/bootstrap/{bootstrap_version}/css/bootstrap.min.css",
-            "integrity": "sha384-Vkoo8x4CGsO3+Hhxv8T/Q5PaXtkKtu6ug5TOeNV6gBiFeWPGFN9MuhOf23Q9Ifjh",
-            "crossorigin": "anonymous",
-        },
-        "javascript_url": {
-            "url": f"https://stackpath.bootstrapcdn.com/bootstrap/{bootstrap_version}/js/bootstrap.min.js",
-            "integrity": "sha384-wfSDF2E50Y2D1uUdj0O3uMBJnjuUD4Ih7YwaYd1iqfktj0Uod8GCExl3Og8ifwB6",
-            "crossorigin": "anonymous",
-        },
-        "javascript_bundle_url": {
-            "url": f"https://stackpath.bootstrapcdn.com/bootstrap/{bootstrap_version}/js/bootstrap.bundle.min.js",
-            "integrity": "sha384-6khuMg9gaYr5AxOqhkVIODVIvm9ynTT5J4V1cfthmT+emCG6yVmEZsRHdxlotUnm",
-            "crossorigin": "anonymous",
-        },
-        "jquery_url": {
-            "url": f"https://code.jquery.com/jquery-{jquery_version}.min.js",
-            "integrity": "sha384-tsQFqpEReu7ZLhBV2VZlAu7zcOV+rXbYlF2cqB8txI/8aZajjp4Bqd+V6D5IgvKT",
-            "crossorigin": "anonymous",
-        },
-        "jquery_slim_url": {
-            "url": f"https://code.jquery.com//jquery-{jquery_version}.slim.min.js",
-            "integrity": "sha384-q8i/X+965DzO0rT7abK41JStQIAqVgRVzpbzo5smXKp4YfRvH+8abtTE1Pi6jizo",
-            "crossorigin": "anonymous",
-        },
-        "popper_url": {
-            "url": f"https://cdnjs.cloudflare.com/ajax/libs/popper.js/{popover_version}/umd/popper.min.js",
-            "integrity": "sha384-ZMP7rVo3mIykV+2+9J3UJ46jBk0WLaUAdn689aCwoqbBJiSnjAK/l8WvCWPIPm49",
-            "crossorigin": "anonymous",
-        },
-        "fontawesome_url": {
-            "href": f"https://stackpath.bootstrapcdn.com/font-awesome/{fontawesome_version}/css/font-awesome.min.css",
-            "integrity": "sha384-wvfXpqpZZVQGK6TAh5PVlGOfQNHSoD2xbE+QkPxCAFlNEevoEH3Sl0sibVcOQVnN",
-            "crossorigin": "anonymous",
-        },
-    }
+    urls_settings = default_urls_settings(bootstrap_version, jquery_version, popover_version, fontawesome_version)
     if setting.get('use_db', False):
+        urls_settings = dict(urls_settings)
         css_url = IncludeBootstrap.get_active_instance(4)
         javascript_url = IncludeBootstrap.get_active_instance(1)
         jquery_url = IncludeBootstrap.get_active_instance(2)
         popper_url = IncludeBootstrap.get_active_instance(3)
         fontawesome_url = IncludeBootstrap.get_active_instance(5)
-        if css_url:
-            urls_settings['css_url'].update({'href': css_url.url, 'integrity': css_url.integrity})
-        if fontawesome_url:
-            urls_settings['fontawesome_url'].update({'href': fontawesome_url.url,
-                                                     'integrity': fontawesome_url.integrity})
-        if javascript_url:
-            urls_settings['javascript_url'].update({'url': javascript_url.url, 'integrity': javascript_url.integrity})
+        for name, instance in (('css_url', css_url), ('fontawesome_url', fontawesome_url),
+                               ('javascript_url', javascript_url), ('jquery_url', jquery_url),
+                               ('popper_url', popper_url)):
+            if instance:
+                urls_settings[name] = urls_settings[name].replace(url=instance.url, integrity=instance.integrity)
         if javascript_url and '.bundle' in javascript_url.url:
-            urls_settings['javascript_bundle_url'].update({'url': javascript_url.url,
-                                                           'integrity': javascript_url.integrity})
-        if jquery_url:
-            urls_settings['jquery_url'].update({'url': jquery_url.url, 'integrity': jquery_url.integrity})
+            urls_settings['javascript_bundle_url'] = urls_settings['javascript_url']
         if jquery_url and '.slim' in jquery_url.url:
-            urls_settings['jquery_slim_url'].update({'url': jquery_url.url, 'integrity': jquery_url.integrity})
-        if popper_url:
-            urls_settings['popper_url'].update({'url': popper_url.url, 'integrity': popper_url.integrity})
+            urls_settings['jquery_slim_url'] = urls_settings['jquery_url']
+        urls_settings = MappingProxyType(urls_settings)
     return urls_settings
 
 
 def get_bootstrap_setting(name, default=None):
     """Read a setting."""
-    # Start with a copy of default settings
-    SETTINGS = deepcopy(INCLUDE_BOOTSTRAP_SETTINGS)
+    user_settings = getattr(settings, "INCLUDE_BOOTSTRAP_SETTINGS", {})
 
-    # Override with user settings from settings.py
-    SETTINGS.update(getattr(settings, "INCLUDE_BOOTSTRAP_SETTINGS", {}))
+    # Update use_i18n
+    if name == "use_i18n":
+        return i18n_enabled()
 
-    # Generate settings
-    URLS = generate_urls_settings(SETTINGS)
-    SETTINGS.update(**URLS)
+    # Generate url settings only when one of them is read, defaults are overridden with user settings
+    if name in URL_SETTINGS:
+        return generate_urls_settings({**INCLUDE_BOOTSTRAP_SETTINGS, **user_settings})[name]
 
-    # Update use_i18n
-    SETTINGS["use_i18n"] = i18n_enabled()
-    return SETTINGS.get(name, default)
+    if name in user_settings:
+        return user_settings[name]
+    return INCLUDE_BOOTSTRAP_SETTINGS.get(name, default)
 
 
 def fontawesome_css_url():
-    """Return the full url to Fontawesome library file to use."""
-    return get_bootstrap_setting("fontawesome_url")
+    """Return the full url to Fontawesome library file to use, subset one if it was built."""
+    return built_url("fontawesome_url", kind="link") or get_bootstrap_setting("fontawesome_url")
 
 
 def jquery_url():
@@ -150,8 +230,48 @@ def javascript_bundle_url():
 
 
 def css_url():
-    """Return the full url to the Bootstrap CSS file."""
-    return get_bootstrap_setting("css_url")
+    """Return the full url to the Bootstrap CSS file, purged one if it was built."""
+    return built_url("css_url", kind="link") or get_bootstrap_setting("css_url")
+
+
+def built_url(name, kind="script"):
+    """
+    Return the AssetSpec of an asset from the build manifest, None if it was not built.
+
+    Specs are cached with the manifest, so they are created again only when it changes.
+    """
+    if not get_bootstrap_setting("use_build"):
+        return None
+    try:
+        manifest, specs = manifest_specs(get_build_dir(get_bootstrap_setting("build_dir")))
+    except BuildError:
+        return None
+    key = (name, kind, settings.STATIC_URL)
+    if key not in specs:
+        entry = manifest.get(name)
+        specs[key] = None
+        if entry:
+            specs[key] = AssetSpec(static(entry["path"]), served_integrity(entry), "anonymous", kind=kind)
+    return specs[key]
+
+
+def javascript_components_url(components):
+    """
+    Return the AssetSpec of the Bootstrap JavaScript built with the given components, None if it was not built.
+
+    Raises BuildError for unknown components.
+    """
+    return built_url(components_key(components))
+
+
+def require_assets(*groups):
+    """Record asset groups needed by the current response, does nothing without IncludeBootstrapMiddleware."""
+    for group in groups:
+        if group not in ASSET_GROUPS:
+            raise ValueError(f'Unknown asset group "{group}", choose from {", ".join(ASSET_GROUPS)}')
+    assets = required_assets.get()
+    if assets is not None:
+        assets.update(groups)
 
 
 def i18n_enabled():
@@ -175,6 +295,8 @@ def text_value(value):
 
 def render_script_tag(url):
     """Build a script tag."""
+    if isinstance(url, AssetSpec):
+        return url.html
     url_dict = sanitize_url_dict(url)
     url_dict.setdefault("src", url_dict.pop("url", None))
     return render_tag("script", url_dict)
@@ -182,6 +304,10 @@ def render_script_tag(url):
 
 def render_link_tag(url, rel="stylesheet", media=None):
     """Build a link tag."""
+    if isinstance(url, AssetSpec):
+        if rel == "stylesheet" and not media:
+            return url.html
+        url = url.as_dict()
     url_dict = sanitize_url_dict(url, url_attr="href")
     url_dict.setdefault("href", url_dict.pop("url", None))
     url_dict["rel"] = rel
@@ -191,8 +317,10 @@ def render_link_tag(url, rel="stylesheet", media=None):
 
 
 def render_tag(tag, attrs=None, content=None, close=True):
-    """Render a HTML tag."""
+    """Render a HTML tag, attrs is a dict or an already escaped string."""
     builder = "<{tag}{attrs}>{content}"
     if content or close:
         builder += "</{tag}>"
-    return format_html(builder, tag=tag, attrs=mark_safe(flatatt(attrs)) if attrs else "", content=text_value(content))
+    if attrs and not isinstance(attrs, str):
+        attrs = mark_safe(flatatt(attrs))
+    return format_html(builder, tag=tag, attrs=attrs or "", content=text_value(content))